@@ -1,43 +1,184 @@
 import sys
+import gc
+import functools
+import threading
 import numpy as np
 import sounddevice as sd
-from scipy import signal
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTextEdit, QLabel, QSpinBox
-from PyQt5.QtCore import QThread, pyqtSignal, QObject, QTimer, QMutex
+from PyQt5.QtCore import QThread, pyqtSignal, QObject, QTimer, QMutex, QRunnable, QThreadPool
 from PyQt5.QtWidgets import QDial
 import re
 import random
 
+def fast_sin(x):
+    # Fold x into [-pi/2, pi/2], then use the Pade approximant x(60 - 7x^2) / (60 + 3x^2).
+    # Good to about 0.5%, which is plenty for short decaying one-shots
+    x = x - np.float32(2 * np.pi) * np.round(x * np.float32(1 / (2 * np.pi)))
+    x = np.where(x > np.float32(np.pi / 2), np.float32(np.pi) - x, x)
+    x = np.where(x < np.float32(-np.pi / 2), np.float32(-np.pi) - x, x)
+    x2 = x * x
+    return x * (60 - 7 * x2) / (60 + 3 * x2)
+
+def butter_lowpass_sos(order, cutoff):
+    # Digital Butterworth low-pass (even order, cutoff as a fraction of Nyquist) as
+    # biquad sections (b0, b1, b2, a1, a2): pre-warp the cutoff, bilinear transform
+    # each conjugate pole pair of the analog prototype and scale every section to unity DC gain
+    warped = 4 * np.tan(np.pi * cutoff / 2)
+    sections = []
+    for k in range(order // 2):
+        pole = warped * np.exp(1j * np.pi * (2 * k + order + 1) / (2 * order))
+        z = (4 + pole) / (4 - pole)
+        a1, a2 = -2 * z.real, abs(z) ** 2
+        gain = (1 + a1 + a2) / 4
+        sections.append((float(gain), float(2 * gain), float(gain), float(a1), float(a2)))
+    return sections
+
+def biquad_filter(sections, x):
+    # Run x through each section in transposed direct form II
+    out = x.tolist()
+    for b0, b1, b2, a1, a2 in sections:
+        s1 = s2 = 0.0
+        for n, xn in enumerate(out):
+            yn = b0 * xn + s1
+            s1 = b1 * xn - a1 * yn + s2
+            s2 = b2 * xn - a2 * yn
+            out[n] = yn
+    return np.array(out)
+
+# Codes for the one-character symbols that make a sound; everything else is -1
+SYMBOL_CODES = {'@': 0, '$': 1, 'K': 2, 'B': 3, 'S': 4, 'C': 5, 'H': 6, 'O': 7, 'P': 8}
+SYMBOL_TABLE = np.full(256, -1, dtype=np.int8)
+for symbol, code in SYMBOL_CODES.items():
+    SYMBOL_TABLE[ord(symbol)] = code
+# Every code point str.split() treats as whitespace
+WHITESPACE_CODES = np.array([c for c in range(0x3001) if chr(c).isspace()], dtype=np.uint32)
+# Semitones above C for the melody and bass note names
+NOTE_TABLE = {'C': 0, 'C#': 1, 'D': 2, 'D#': 3, 'E': 4, 'F': 5, 'F#': 6, 'G': 7, 'G#': 8, 'A': 9, 'A#': 10, 'B': 11}
+OCTAVE_DIGITS = ('0', '1', '2', '3', '4', '5', '6', '7', '8', '9')
+
+# The one-shot sounds never change, so they are built once at import.
+# float32 operands keep numpy on its single precision SIMD loops, and
+# a fixed seed keeps the noise the same from run to run
+_rng = np.random.default_rng(42)
+
+_t = np.linspace(0, 0.05, int(44100 * 0.05), False, dtype=np.float32)
+CLICK = fast_sin(np.float32(2 * np.pi * 1000) * _t) * np.exp(-_t * np.float32(20))
+ACCENT = fast_sin(np.float32(2 * np.pi * 1500) * _t) * np.exp(-_t * np.float32(20))
+
+_t = np.linspace(0, 0.1, int(44100 * 0.1), False, dtype=np.float32)
+KICK = fast_sin(np.float32(2 * np.pi * 60) * _t) * np.exp(-_t * np.float32(20))
+BASS = fast_sin(np.float32(2 * np.pi * 50) * _t) * np.exp(-_t * np.float32(15))
+SNARE = _rng.standard_normal(int(44100 * 0.1), dtype=np.float32) * np.float32(0.1)
+
+# Low-pass filtered noise burst for the clap, filtered in float64 second-order sections for stability
+CLAP_SOS = butter_lowpass_sos(4, 2000 / (44100 / 2))
+CLAP = biquad_filter(CLAP_SOS, _rng.standard_normal(int(44100 * 0.05), dtype=np.float32) * 0.1 * np.exp(-np.linspace(0, 20, int(44100 * 0.05)))).astype(np.float32)
+
+CLOSED_HAT = _rng.standard_normal(int(44100 * 0.05), dtype=np.float32) * np.float32(0.1) * np.exp(-np.arange(int(44100 * 0.05), dtype=np.float32) / np.float32(44100 * 0.01))
+OPEN_HAT = _rng.standard_normal(int(44100 * 0.1), dtype=np.float32) * np.float32(0.1) * np.exp(-np.arange(int(44100 * 0.1), dtype=np.float32) / np.float32(44100 * 0.05))
+PEDAL_HAT = _rng.standard_normal(int(44100 * 0.075), dtype=np.float32) * np.float32(0.1) * np.exp(-np.arange(int(44100 * 0.075), dtype=np.float32) / np.float32(44100 * 0.025))
+
+# One cycle of each keyed voice with its gain baked in, indexed by the top 14 bits of a 32-bit phase.
+# The bass's second partial is in its table too, so it doesn't need a second accumulator
+_cycle = 2 * np.pi * np.arange(1 << 14) / (1 << 14)
+MELODY_LUT = (0.3 * np.sin(_cycle)).astype(np.float32)
+BASS_LUT = (0.3 * (np.sin(_cycle) + 0.5 * np.sin(2 * _cycle))).astype(np.float32)
+
 class AudioMixer:
     def __init__(self):
-        self.tracks = {}
-        self.mutex = QMutex()
-
-    def add_track(self, name, audio_data):
+        # Writers swap in a new immutable tuple of (name, (audio_data, gain)) pairs,
+        # so readers only ever load one reference and never need the mutex
+        self._snapshot = ()
+        self.mutex = QMutex()  # Only serializes writers
+        self._out = np.zeros(0, dtype=np.float32)
+        # The last mix, together with the snapshot it was made from
+        self._mixed = ((), None)
+
+    def add_track(self, name, audio_data, gain=1.0):
         self.mutex.lock()
-        self.tracks[name] = audio_data
+        tracks = dict(self._snapshot)
+        tracks[name] = (audio_data, gain)
+        self._snapshot = tuple(tracks.items())
         self.mutex.unlock()
 
     def remove_track(self, name):
         self.mutex.lock()
-        if name in self.tracks:
-            del self.tracks[name]
+        tracks = dict(self._snapshot)
+        if tracks.pop(name, None) is not None:
+            self._snapshot = tuple(tracks.items())
         self.mutex.unlock()
 
-    def get_mixed_audio(self):
+    def clear(self):
         self.mutex.lock()
-        if not self.tracks:
-            self.mutex.unlock()
-            return np.zeros(0)
-        max_length = max(len(audio) for audio in self.tracks.values())
-        mixed_audio = np.zeros(max_length)
-        for audio in self.tracks.values():
-            mixed_audio[:len(audio)] += audio
+        self._snapshot = ()
         self.mutex.unlock()
+
+    def get_mixed_audio(self):
+        snapshot = self._snapshot
+        mixed_snapshot, mixed_audio = self._mixed
+        if mixed_snapshot is snapshot and mixed_audio is not None:
+            return mixed_audio  # Nothing changed since the last mix
+        items = [track for name, track in snapshot]
+        if not items:
+            return np.zeros(0, dtype=np.float32)
+        max_length = max(len(audio) for audio, gain in items)
+        # Reuse the output buffer between mixes, it is only reallocated when it has to grow.
+        # The returned array is overwritten by the next call
+        if self._out.size < max_length:
+            self._out = np.empty(max_length, dtype=np.float32)
+        mixed_audio = self._out[:max_length]
+        # Summing straight into the output beats padding the tracks into a block for one matmul,
+        # since the block costs a full extra copy of every track
+        mixed_audio.fill(0)
+        for audio, gain in items:
+            if gain == 1.0:
+                mixed_audio[:len(audio)] += audio  # Unity gain needs no scaled temporary
+            else:
+                mixed_audio[:len(audio)] += gain * audio
+        # Tagged with its snapshot, so a mix that raced with an edit is never reused
+        self._mixed = (snapshot, mixed_audio)
         return mixed_audio # / len(self.tracks)
 
 audio_mixer = AudioMixer()
 
+class AudioRingBuffer:
+    def __init__(self, size=1 << 16):
+        # size must be a power of two so positions can be wrapped with a mask
+        self.buffer = np.zeros(size, dtype=np.float32)
+        self.mask = size - 1
+        # head is only moved by the consumer and tail only by the producer,
+        # so neither side has to take a lock
+        self.head = 0
+        self.tail = 0
+        # Set by the producer once it has written everything it is going to
+        self.done_writing = False
+
+    def write(self, data):
+        tail = self.tail
+        count = min(len(data), len(self.buffer) - (tail - self.head))
+        start = tail & self.mask
+        first = min(count, len(self.buffer) - start)
+        self.buffer[start:start + first] = data[:first]
+        self.buffer[:count - first] = data[first:count]
+        self.tail = tail + count
+        return count
+
+    def read_into(self, out):
+        head = self.head
+        count = min(len(out), self.tail - head)
+        start = head & self.mask
+        first = min(count, len(self.buffer) - start)
+        out[:first] = self.buffer[start:start + first]
+        out[first:count] = self.buffer[:count - first]
+        out[count:] = 0  # Play silence on underrun
+        self.head = head + count
+        return count
+
+    def clear(self):
+        # Only safe while the stream is stopped
+        self.head = self.tail = 0
+        self.done_writing = False
+
 class AudioPlaybackThread(QThread):
     update_display = pyqtSignal(str)
 
@@ -46,38 +187,104 @@ class AudioPlaybackThread(QThread):
         self.track_name = track_name
         self.symbols = symbols
         self.tempo = tempo
-        self.is_playing = True
-        self.mutex = QMutex()
+        self._stop = threading.Event()
 
     def run(self):
         beat_duration = 60 / self.tempo / 4
         for symbol in self.symbols:
-            self.mutex.lock()
-            if not self.is_playing:
-                self.mutex.unlock()
+            if self._stop.is_set():
                 break
-            self.mutex.unlock()
             self.update_display.emit(symbol)
             self.msleep(int(beat_duration * 1000))
 
     def stop(self):
-        self.mutex.lock()
-        self.is_playing = False
-        self.mutex.unlock()
+        self._stop.set()
 
 class GlobalPlaybackThread(QThread):
-    def __init__(self, audio_data):
+    def __init__(self, audio_data, ring):
         super().__init__()
         self.audio_data = audio_data
+        self.ring = ring
         self.is_playing = True
 
     def run(self):
-        sd.play(self.audio_data, 44100)
-        sd.wait()
+        # Keep the ring topped up until the whole mix has been handed over
+        position = 0
+        while self.is_playing and position < len(self.audio_data):
+            written = self.ring.write(self.audio_data[position:position + 4096])
+            position += written
+            if not written:
+                self.msleep(10)
+        if position >= len(self.audio_data):
+            self.ring.done_writing = True  # The callback stops the stream once the ring runs dry
 
     def stop(self):
         self.is_playing = False
-        sd.stop()
+
+class AudioOutput:
+    def __init__(self):
+        self.ring = AudioRingBuffer()
+        self.stream = None
+        self.feeder = None
+
+    def callback(self, outdata, frames, time, status):
+        # Runs on the PortAudio thread: no mixing or allocation here, just one copy out of the ring
+        if self.ring.read_into(outdata[:, 0]) < frames and self.ring.done_writing:
+            raise sd.CallbackStop  # The whole mix has been played, this block still goes out
+
+    def open(self):
+        # The stream is opened once and only started/aborted afterwards.
+        # Small blocks keep each callback short, the high latency setting leaves
+        # PortAudio enough buffered audio to ride out a busy GIL
+        if self.stream is None:
+            self.stream = sd.OutputStream(samplerate=44100, channels=1, dtype='float32',
+                                          blocksize=256, latency='high', callback=self.callback)
+
+    def close(self):
+        self.stop()
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def play(self, audio_data):
+        self.stop()
+        self.open()
+        self.feeder = GlobalPlaybackThread(audio_data, self.ring)
+        self.feeder.start()
+        self.stream.start()
+        return self.feeder
+
+    def stop(self):
+        if self.feeder and self.feeder.isRunning():
+            self.feeder.stop()
+            self.feeder.wait()
+        self.feeder = None
+        # A stream that stopped itself from the callback still has to be stopped before it can restart
+        if self.stream is not None and not self.stream.stopped:
+            self.stream.abort()
+        self.ring.clear()
+
+audio_output = AudioOutput()
+
+class RenderSignals(QObject):
+    finished = pyqtSignal(str, int, object)
+
+class RenderTask(QRunnable):
+    def __init__(self, render, notation, tempo):
+        super().__init__()
+        self.render = render
+        self.notation = notation
+        self.tempo = tempo
+        self.signals = RenderSignals()
+
+    def run(self):
+        # Runs on a pool thread so long notations don't freeze the GUI
+        try:
+            audio_data = self.render(self.notation, self.tempo)
+        except Exception as e:
+            print(f"Error rendering audio: {str(e)}")
+            audio_data = None  # Still report back, so nothing waits on this render forever
+        self.signals.finished.emit(self.notation, self.tempo, audio_data)
         
 import anthropic
 class Track(QWidget):
@@ -86,8 +293,13 @@ class Track(QWidget):
         self.name = name
         self.gain = 1.0
         self.initUI()
+        # A render only depends on the notation and tempo, so keep the last few around.
+        # Each entry is a whole track, so a handful per track is plenty for flipping between tempos
+        self.cached_render = functools.lru_cache(maxsize=4)(self._render)
+        self.text_input.textChanged.connect(self.cached_render.cache_clear)
         self.playback_thread = None
         self.audio_thread = None
+        self.pending_render = None
         self.client = anthropic.Client(api_key="Your API Key Here")  # Replace with your actual API key
 
     def initUI(self):
@@ -122,7 +334,6 @@ class Track(QWidget):
         layout.addWidget(self.generate_button)
         self.setLayout(layout)
 
-        self.play_button.clicked.connect(self.play)
         self.generate_button.clicked.connect(self.generate_text)
 
 # s
@@ -161,9 +372,19 @@ class Track(QWidget):
         notation = self.text_input.toPlainText()
         tempo = self.parent().parent().tempo_spinbox.value()
     
-        audio_data = self.create_audio_data(notation, tempo)
-        audio_data *= self.gain  # Apply gain to the audio data
-        audio_mixer.add_track(self.name, audio_data)
+        task = RenderTask(self.cached_render, notation, tempo)
+        task.signals.finished.connect(self.start_playback)
+        self.pending_render = task.signals
+        QThreadPool.globalInstance().start(task)
+
+    def start_playback(self, notation, tempo, audio_data):
+        if self.sender() is not self.pending_render:
+            return  # A newer play or a stop has replaced this render
+        self.pending_render = None
+        if audio_data is None:
+            return  # The render failed, there is nothing to play
+        # The mixer applies the gain while it sums, so the cached render is used as is
+        audio_mixer.add_track(self.name, audio_data, self.gain)
         symbols = notation.replace('|', '').split()
         self.playback_thread = AudioPlaybackThread(self.name, symbols, tempo)
         self.playback_thread.update_display.connect(self.update_display)
@@ -171,59 +392,97 @@ class Track(QWidget):
 
         # Start audio playback only if not playing globally
         if not self.parent().parent().is_playing_globally:
-            self.audio_thread = GlobalPlaybackThread(audio_mixer.get_mixed_audio())
-            self.audio_thread.start()
-
-    def stop(self):
-        if self.playback_thread and self.playback_thread.isRunning():
-            self.playback_thread.stop()
-            self.playback_thread.wait()
-        if self.audio_thread and self.audio_thread.isRunning():
-            sd.stop()
-            self.audio_thread.wait()
-        self.audio_thread = None
-        audio_mixer.remove_track(self.name)
-        self.display_label.setText("Display")
+            audio_output.stop()  # The old feeder may still be reading the mixer's buffer
+            self.audio_thread = audio_output.play(audio_mixer.get_mixed_audio())
 
     def create_audio_data(self, notation, tempo):
         # This method should be overridden by subclasses
         pass
 
+    @staticmethod
+    def _tokenize(notation):
+        # One element per code point, with the bar lines dropped like replace('|', '')
+        chars = np.frombuffer(notation.encode('utf-32-le'), dtype=np.uint32)
+        chars = chars[chars != ord('|')]
+        # Tokens are the runs between whitespace, exactly like split()
+        gap = np.concatenate(([True], np.isin(chars, WHITESPACE_CODES), [True]))
+        edges = np.diff(gap.astype(np.int8))
+        starts = np.flatnonzero(edges == -1)
+        ends = np.flatnonzero(edges == 1)
+        tokens = np.full(len(starts), -1, dtype=np.int8)
+        single = ends - starts == 1
+        tokens[single] = SYMBOL_TABLE[np.minimum(chars[starts[single]], 255)]
+        return tokens, len(tokens)
+
+    def _render(self, notation, tempo):
+        audio_data = self.create_audio_data(notation, tempo)
+        audio_data.setflags(write=False)  # Cached renders are shared between plays
+        return audio_data
+
     def update_display(self, text):
         self.display_label.setText(text)
 
     def stop(self):
+        self.pending_render = None
         if self.playback_thread and self.playback_thread.isRunning():
             self.playback_thread.stop()
             self.playback_thread.wait()
-        if self.audio_thread and self.audio_thread.isRunning():
-            sd.stop()
-            self.audio_thread.wait()
+        # Only stop the output if it is still playing what this track started
+        if self.audio_thread is not None and self.audio_thread is audio_output.feeder:
+            audio_output.stop()
+        self.audio_thread = None
         audio_mixer.remove_track(self.name)
         self.display_label.setText("Display")
 
-class MetronomeTrack(Track):
+class PercussionTrack(Track):
+    # Cut every sound off at the next step instead of letting it ring over
+    choke = False
+
     def __init__(self, name):
         super().__init__(name)
-        self.beat_count = 0
+        # The kernels only depend on the tempo, so each track keeps its own for the last few tempos
+        self.cached_kernels = functools.lru_cache(maxsize=16)(self._kernels_for)
+
+    def hit_sounds(self):
+        # (symbol, sound) pairs to place on the step grid, overridden by subclasses
+        return ()
+
+    def _kernels_for(self, tempo):
+        # Specialize the sounds for one tempo: resolve the symbol codes, cut choked sounds
+        # to a step and split the rest into zero padded rows of one step each
+        step = int(44100 * (60 / tempo / 4))
+        kernels = []
+        for symbol, sound in self.hit_sounds():
+            if self.choke:
+                sound = sound[:step]
+            rows = np.zeros(-(-len(sound) // step) * step, dtype=np.float32)
+            rows[:len(sound)] = sound
+            kernels.append((SYMBOL_CODES[symbol], rows.reshape(-1, step)))
+        return step, tuple(kernels)
 
     def create_audio_data(self, notation, tempo):
         beat_duration = 60 / tempo / 4
-        symbols = notation.replace('|', '').split()
-        full_sequence = np.zeros(int(44100 * beat_duration * len(symbols)))
+        tokens, n = self._tokenize(notation)
+        length = int(44100 * beat_duration * n)
         
-        t = np.linspace(0, 0.05, int(44100 * 0.05), False)
-        click = np.sin(2 * np.pi * 1000 * t) * np.exp(-t * 20)
-        accent = np.sin(2 * np.pi * 1500 * t) * np.exp(-t * 20)
+        step, kernels = self.cached_kernels(tempo)
+        # Lay the sequence out as one row per symbol, with spare rows for sounds ringing past the end
+        spare = max((len(rows) for code, rows in kernels), default=1)
+        grid = np.zeros((max(n + spare, -(-length // step)), step), dtype=np.float32)
+        for code, rows in kernels:
+            hits = np.flatnonzero(tokens == code)
+            for i, row in enumerate(rows):
+                grid[hits + i] += row
         
-        for i, symbol in enumerate(symbols):
-            start = int(i * 44100 * beat_duration)
-            if symbol == '@':
-                full_sequence[start:start+len(click)] += click
-            elif symbol == '$':
-                full_sequence[start:start+len(accent)] += accent
-        
-        return full_sequence # * 0.5  # Increase volume
+        return grid.ravel()[:length]
+
+class MetronomeTrack(PercussionTrack):
+    def __init__(self, name):
+        super().__init__(name)
+        self.beat_count = 0
+
+    def hit_sounds(self):
+        return (('@', CLICK), ('$', ACCENT))
 
     def update_display(self, text):
         if text in ['@', '$']:
@@ -331,8 +590,8 @@ Now go ahead and start! your job is to create your own ideas for 4 or 8 or 16 or
 class LyricsTrack(Track):
     def create_audio_data(self, notation, tempo):
         beat_duration = 60 / tempo / 4
-        symbols = notation.replace('|', '').split()
-        return np.zeros(int(44100 * beat_duration * len(symbols)))
+        _, num_symbols = self._tokenize(notation)  # Only the length matters, words are silent
+        return np.zeros(int(44100 * beat_duration * num_symbols), dtype=np.float32)
     def generate_text(self):
         prompt = f"""\n\nHuman: you are going to be a composing madman! I've just invented a new Notation system. The best part about using this system for you is that its so new that you don't have to worry about accidentally stealing someones work- becuase youll be the first one besides me to write in it! heres how the notation works!
 
@@ -427,47 +686,11 @@ Now go ahead and start! your job is to create your own ideas for 4 or 8 or 16 or
                 
     
 
-class DrumTrack(Track):
-    def create_audio_data(self, notation, tempo):
-        beat_duration = 60 / tempo / 4
-        symbols = notation.replace('|', '').split()
-        full_sequence = np.zeros(int(44100 * beat_duration * len(symbols)))
-        
-        t = np.linspace(0, 0.1, int(44100 * 0.1), False)
-        kick = np.sin(2 * np.pi * 60 * t) * np.exp(-t * 20)
-        bass = np.sin(2 * np.pi * 50 * t) * np.exp(-t * 15)
-        snare = np.random.normal(0, 0.1, int(44100 * 0.1))
-        
-        # Create a clap sound
-        clap_env = np.exp(-np.linspace(0, 20, int(44100 * 0.05)))
-        clap_noise = np.random.normal(0, 0.1, int(44100 * 0.05))
-        clap = clap_noise * clap_env
-        
-        # Apply a low-pass filter to the clap
-        b, a = signal.butter(4, 2000 / (44100 / 2), btype='lowpass')
-        clap = signal.lfilter(b, a, clap)
-        
-        for i, symbol in enumerate(symbols):
-            start = int(i * 44100 * beat_duration)
-            end = start + int(44100 * beat_duration)
-            if symbol == 'K':
-                full_sequence[start:end] += self.fit_sound(kick, start, end)
-            elif symbol == 'B':
-                full_sequence[start:end] += self.fit_sound(bass, start, end)
-            elif symbol == 'S':
-                full_sequence[start:end] += self.fit_sound(snare, start, end)
-            elif symbol == 'C':
-                full_sequence[start:end] += self.fit_sound(clap, start, end)
-        
-        return full_sequence
+class DrumTrack(PercussionTrack):
+    choke = True
 
-    def fit_sound(self, sound, start, end):
-        if len(sound) > (end - start):
-            return sound[:end-start]
-        else:
-            padded_sound = np.zeros(end - start)
-            padded_sound[:len(sound)] = sound
-            return padded_sound
+    def hit_sounds(self):
+        return (('K', KICK), ('B', BASS), ('S', SNARE), ('C', CLAP))
         
     def generate_text(self):
         prompt = f"""\n\nHuman: you are going to be a composing madman! I've just invented a new Notation system. The best part about using this system for you is that its so new that you don't have to worry about accidentally stealing someones work- becuase youll be the first one besides me to write in it! heres how the notation works!
@@ -561,26 +784,9 @@ Now go ahead and start! your job is to create your own ideas for 4 or 8 or 16 or
 
         self.text_input.setText(processed_text)
 
-class HatTrack(Track):
-    def create_audio_data(self, notation, tempo):
-        beat_duration = 60 / tempo / 4
-        symbols = notation.replace('|', '').split()
-        full_sequence = np.zeros(int(44100 * beat_duration * len(symbols)))
-        
-        closed_hat = np.random.normal(0, 0.1, int(44100 * 0.05)) * np.exp(-np.arange(int(44100 * 0.05)) / (44100 * 0.01))
-        open_hat = np.random.normal(0, 0.1, int(44100 * 0.1)) * np.exp(-np.arange(int(44100 * 0.1)) / (44100 * 0.05))
-        pedal_hat = np.random.normal(0, 0.1, int(44100 * 0.075)) * np.exp(-np.arange(int(44100 * 0.075)) / (44100 * 0.025))
-        
-        for i, symbol in enumerate(symbols):
-            start = int(i * 44100 * beat_duration)
-            if symbol == 'H':
-                full_sequence[start:start+len(closed_hat)] += closed_hat
-            elif symbol == 'O':
-                full_sequence[start:start+len(open_hat)] += open_hat
-            elif symbol == 'P':
-                full_sequence[start:start+len(pedal_hat)] += pedal_hat
-        
-        return full_sequence
+class HatTrack(PercussionTrack):
+    def hit_sounds(self):
+        return (('H', CLOSED_HAT), ('O', OPEN_HAT), ('P', PEDAL_HAT))
     
     def generate_text(self):
         prompt = f"""\n\nHuman: you are going to be a composing madman! I've just invented a new Notation system. The best part about using this system for you is that its so new that you don't have to worry about accidentally stealing someones work- becuase youll be the first one besides me to write in it! heres how the notation works!
@@ -683,74 +889,62 @@ Now go ahead and start! your job is to create your own ideas for 4 or 8 or 16 or
         self.text_input.setText(processed_text)
 
 class MelodyTrack(Track):
+    wavetable = MELODY_LUT
+
     def create_audio_data(self, notation, tempo):
         beat_duration = 60 / tempo / 4
         symbols = notation.replace('|', '').split()
-        full_sequence = np.zeros(int(44100 * beat_duration * len(symbols)))
-        
-        current_note = None
-        current_duration = 0
+        full_sequence = np.zeros(int(44100 * beat_duration * len(symbols)), dtype=np.float32)
+        step = int(44100 * beat_duration)
+        onsets, durations = self.note_events(symbols)
         
-        for i, symbol in enumerate(symbols):
-            if symbol not in ['-', '.']:
-                if current_note:
-                    freq = self.note_to_freq(current_note)
-                    sound = self.create_key_sound(freq, beat_duration * current_duration)
-                    start = int((i - current_duration) * 44100 * beat_duration)
-                    end = start + len(sound)
-                    if end > len(full_sequence):
-                        end = len(full_sequence)
-                        sound = sound[:end-start]
-                    full_sequence[start:end] += sound
-                current_note = symbol
-                current_duration = 1
-            elif symbol == '-':
-                current_duration += 1
-            elif symbol == '.':
-                if current_note:
-                    freq = self.note_to_freq(current_note)
-                    sound = self.create_key_sound(freq, beat_duration * current_duration)
-                    start = int((i - current_duration) * 44100 * beat_duration)
-                    end = start + len(sound)
-                    if end > len(full_sequence):
-                        end = len(full_sequence)
-                        sound = sound[:end-start]
-                    full_sequence[start:end] += sound
-                    current_note = None
-                    current_duration = 0
+        # Sample count of every note, worked out once so the buffers below always fit
+        lengths = (44100 * (beat_duration * durations)).astype(int)
         
-        # Play the last note if there is one
-        if current_note:
-            freq = self.note_to_freq(current_note)
-            sound = self.create_key_sound(freq, beat_duration * current_duration)
-            start = int((len(symbols) - current_duration) * 44100 * beat_duration)
-            end = start + len(sound)
-            if end > len(full_sequence):
-                end = len(full_sequence)
-                sound = sound[:end-start]
-            full_sequence[start:end] += sound
+        # One sample counter and two work buffers, sized for the longest note, serve every note.
+        # They belong to this render, so renders of the same track on other pool threads can't clash
+        longest = lengths.max() if len(lengths) else 0
+        ramp = np.arange(longest, dtype=np.uint32)
+        phase = np.empty(longest, dtype=np.uint32)
+        tone = np.empty(longest, dtype=np.float32)
+        for onset, length in zip(onsets, lengths):
+            freq = self.note_to_freq(symbols[onset])
+            self.add_key_sound(full_sequence[onset * step:], freq, length, ramp, phase, tone)
         
         return full_sequence
 
-    def note_to_freq(self, note):
-        notes = {'C': 0, 'C#': 1, 'D': 2, 'D#': 3, 'E': 4, 'F': 5, 'F#': 6, 'G': 7, 'G#': 8, 'A': 9, 'A#': 10, 'B': 11}
-        if note[-2] == '#':
-            octave = int(note[-1])
-            note_name = note[:-1]
-        else:
-            octave = int(note[-1])
-            note_name = note[:-1]
-        
-        if note_name not in notes:
+    @staticmethod
+    def note_events(symbols):
+        # A note holds through the hyphens after it and ends at the next note or rest,
+        # so every note runs from its own index to the next symbol that isn't a hyphen
+        arr = np.array(symbols, dtype=str)
+        held = arr == '-'
+        boundaries = np.flatnonzero(~held)
+        ends = np.append(boundaries[1:], len(arr))
+        is_note = arr[boundaries] != '.'
+        onsets = boundaries[is_note]
+        return onsets, ends[is_note] - onsets
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)  # A song only uses a few dozen distinct pitches
+    def note_to_freq(note):
+        # The octave is always the last character and the name (sharp included) is the rest
+        note_name, octave = note[:-1], note[-1:]
+        if note_name not in NOTE_TABLE or octave not in OCTAVE_DIGITS:
             print(f"Invalid note: {note}")
             return 440  # Return A4 as a fallback frequency
         
-        semitones = notes[note_name]
-        return 440 * (2 ** ((semitones - 9) / 12 + (octave - 4)))
-
-    def create_key_sound(self, freq, duration):
-        t = np.linspace(0, duration, int(44100 * duration), False)
-        return 0.3 * np.sin(2 * np.pi * freq * t)
+        return 440 * (2 ** ((NOTE_TABLE[note_name] - 9) / 12 + (int(octave) - 4)))
+
+    def add_key_sound(self, out, freq, length, ramp, phase, tone):
+        # Phase accumulator: sample i is at i * phase_inc, wrapping at 2**32 like a full cycle.
+        # Cut to the room left in out so the last note isn't rendered past the end
+        n = min(length, len(out))
+        phase, tone = phase[:n], tone[:n]
+        np.multiply(ramp[:n], np.uint32(int(freq * 2**32 / 44100)), out=phase)
+        phase >>= 18
+        np.take(self.wavetable, phase, out=tone, mode='clip')  # Unlike 'raise', 'clip' fills out without a hidden copy
+        out[:n] += tone
 
     def update_display(self, text):
         if text != '.':
@@ -760,7 +954,7 @@ class MelodyTrack(Track):
 
     def stop(self):
         super().stop()
-        sd.stop()  # Ensure audio playback is stopped
+        audio_output.stop()  # Ensure audio playback is stopped
 
     def generate_text(self):
         prompt = f"""\n\nHuman: you are going to be a composing madman! I've just invented a new Notation system. The best part about using this system for you is that its so new that you don't have to worry about accidentally stealing someones work- becuase youll be the first one besides me to write in it! heres how the notation works!
@@ -850,13 +1044,11 @@ Now go ahead and start! your job is to create your own ideas for 4 or 8 or 16 or
         self.text_input.setText(processed_text)
 
 class BassTrack(MelodyTrack):
-    def create_key_sound(self, freq, duration):
-        t = np.linspace(0, duration, int(44100 * duration), False)
-        return 0.3 * (np.sin(2 * np.pi * freq * t) + 0.5 * np.sin(4 * np.pi * freq * t))
+    wavetable = BASS_LUT
     
     def stop(self):
         super().stop()
-        sd.stop()  # Ensure audio playback is stopped
+        audio_output.stop()  # Ensure audio playback is stopped
 
     def generate_text(self):
         prompt = f"""\n\nHuman: you are going to be a composing madman! I've just invented a new Notation system. The best part about using this system for you is that its so new that you don't have to worry about accidentally stealing someones work- becuase youll be the first one besides me to write in it! heres how the notation works!
@@ -951,7 +1143,9 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.global_audio_thread = None
         self.is_playing_globally = False
+        self.pending_renders = {}  # Render signals -> track, for play all renders still in flight
         self.initUI()
+        audio_output.open()
 
     def initUI(self):
         self.setWindowTitle("PaperDAW")
@@ -1007,45 +1201,64 @@ class MainWindow(QMainWindow):
 
     def _play_all(self):
         self.is_playing_globally = True
-        audio_mixer.tracks.clear()  # Clear previous tracks
+        audio_mixer.clear()  # Clear previous tracks
+        tempo = self.tempo_spinbox.value()
+        # Tracks are independent, so render them all at once on the pool
+        self.pending_renders = {}
         for track in self.tracks:
             notation = track.text_input.toPlainText()
-            tempo = self.tempo_spinbox.value()
-            audio_data = track.create_audio_data(notation, tempo)
-            audio_data *= track.gain  # Apply gain to the audio data
-            audio_mixer.add_track(track.name, audio_data)
             symbols = notation.replace('|', '').split()
             track.playback_thread = AudioPlaybackThread(track.name, symbols, tempo)
             track.playback_thread.update_display.connect(track.update_display)
-            track.playback_thread.start()
+            task = RenderTask(track.cached_render, notation, tempo)  # Shares the cache with single track play
+            task.signals.finished.connect(self._track_rendered)
+            self.pending_renders[task.signals] = track
+            QThreadPool.globalInstance().start(task)
+
+    def _track_rendered(self, notation, tempo, audio_data):
+        track = self.pending_renders.pop(self.sender(), None)
+        if track is None:
+            return  # Stopped or restarted since this render was queued
+        if audio_data is not None:
+            audio_mixer.add_track(track.name, audio_data, track.gain)
+        else:
+            track.playback_thread = None  # The render failed, play the other tracks without it
+        if self.pending_renders:
+            return  # Wait for the rest so every track starts together
+
+        for track in self.tracks:
+            if track.playback_thread is not None:
+                track.playback_thread.start()
 
         # Start the global audio playback
         self.start_global_audio()
 
     def start_global_audio(self):
+        audio_output.stop()  # The old feeder may still be reading the mixer's buffer
         mixed_audio = audio_mixer.get_mixed_audio()
-        self.global_audio_thread = GlobalPlaybackThread(mixed_audio)
-        self.global_audio_thread.start()
+        self.global_audio_thread = audio_output.play(mixed_audio)
 
     def stop_all(self):
         self.is_playing_globally = False
+        self.pending_renders = {}  # Drop any play all renders still in flight
         for track in self.tracks:
             if isinstance(track, MetronomeTrack):
                 track.reset_beat_count()
             track.stop()
-        if self.global_audio_thread and self.global_audio_thread.isRunning():
-            sd.stop()
-            self.global_audio_thread.wait()
         self.global_audio_thread = None
-        audio_mixer.tracks.clear()  # Clear all tracks from the mixer
-        sd.stop()  # Ensure all audio is stopped
+        audio_mixer.clear()  # Clear all tracks from the mixer
+        audio_output.stop()  # Ensure all audio is stopped
 
     def closeEvent(self, event):
         self.stop_all()
+        audio_output.close()
         event.accept()
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     main_window = MainWindow()
     main_window.show()
+    # Move everything created at startup out of the collector's reach so GC
+    # pauses stay short while the audio callback is waiting on the GIL
+    gc.freeze()
     sys.exit(app.exec_())